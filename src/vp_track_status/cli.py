@@ -10,13 +10,12 @@ from vp_track_status.constants import (
     OBSERVATIONS_FILE,
     RAINFALL_FILE,
 )
-from vp_track_status.predict import predict_current_condition
-from vp_track_status.rainfall import fetch_and_update
-from vp_track_status.website import generate_site
 
 
 def fetch_command(args):
     """Handle the fetch subcommand."""
+    from vp_track_status.rainfall import fetch_and_update
+
     fetch_and_update(
         station_id=args.station_id,
         output_file=args.output,
@@ -45,6 +44,8 @@ def train_command(args):
 
 def predict_command(args):
     """Handle the predict subcommand."""
+    from vp_track_status.predict import predict_current_condition
+
     result = predict_current_condition(
         model_path=args.model,
         rainfall_file=args.rainfall,
@@ -59,8 +60,13 @@ def predict_command(args):
 
 def generate_site_command(args):
     """Handle the generate-site subcommand."""
-    output_file = generate_site(output_dir=args.output_dir)
-    print("\nWebsite generated successfully!")
+    from vp_track_status.website import generate_site
+
+    output_file, rendered = generate_site(output_dir=args.output_dir, force=args.force)
+    if rendered:
+        print("\nWebsite generated successfully!")
+    else:
+        print("\nWebsite is up to date, skipped generation (use --force to rebuild)")
     print(f"Output: {output_file}")
 
 
@@ -161,6 +167,11 @@ def main():
         default="docs",
         help="Output directory for website (default: docs)",
     )
+    site_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate even if the page is newer than the data and model",
+    )
     site_parser.set_defaults(func=generate_site_command)
 
     args = parser.parse_args()
@@ -6,14 +6,23 @@ from pathlib import Path
 PARAMETER = "rainfall"
 ROOT_URL = "https://environment.data.gov.uk/flood-monitoring"
 DEFAULT_STATION_ID = "239374TP"
+HTTP_POOL_SIZE = 16
+HTTP_TIMEOUT = 30  # seconds
+FETCH_WORKERS = 8
+FETCH_WINDOW_DAYS = 31
 
 # Model configuration
 LABEL_MAPPING = {0: "Dry", 1: "Some puddles", 2: "Lots puddles"}
 LABEL_MAPPING_INVERSE = {"Dry": 0, "Some puddles": 1, "Lots puddles": 2}
-FEATURE_COLS = ["rain_1d", "rain_2d", "rain_3d", "rain_5d", "rain_7d"]
+FEATURE_WINDOWS = [1, 2, 3, 5, 7]
+FEATURE_COLS = [f"rain_{size}d" for size in FEATURE_WINDOWS]
+# Rows of history needed to compute every feature for the latest day
+MAX_FEATURE_WINDOW = max(FEATURE_WINDOWS)
 
 # File paths
 DATA_DIR = Path("data")
 RAINFALL_FILE = DATA_DIR / "rainfall" / "rainfall_239374TP_daily.csv"
 OBSERVATIONS_FILE = DATA_DIR / "observations" / "track_observations.csv"
 MODEL_FILE = DATA_DIR / "models" / "track_condition_model.onnx"
+HTTP_CACHE_DIR = Path(".cache") / "http"
+HTTP_CACHE_MAX_AGE_DAYS = 30  # evict entries not revalidated for this long
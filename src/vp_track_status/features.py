@@ -2,16 +2,27 @@
 
 import polars as pl
 
+from vp_track_status.constants import FEATURE_WINDOWS
+
 
 def add_rolling_features(df_rain):
     """Add rolling window rainfall features to dataframe."""
-    window_sizes = [1, 2, 3, 5, 7]
-
+    # Every window is a difference of one cumulative sum; missing days count
+    # as dry, and float error around zero is clipped so dry spells don't come
+    # out as tiny negative totals
+    cumulative = pl.col("_cumulative_rain")
     rolling_features = [
-        pl.col("rainfall_mm")
-        .rolling_sum(window_size=size, min_samples=1)
+        (cumulative - cumulative.shift(size).fill_null(0.0))
+        .clip(lower_bound=0.0)
         .alias(f"rain_{size}d")
-        for size in window_sizes
+        for size in FEATURE_WINDOWS
     ]
 
-    return df_rain.sort("date").with_columns(rolling_features)
+    return (
+        df_rain.sort("date")
+        .with_columns(
+            pl.col("rainfall_mm").fill_null(0.0).cum_sum().alias("_cumulative_rain")
+        )
+        .with_columns(rolling_features)
+        .drop("_cumulative_rain")
+    )
@@ -3,20 +3,21 @@
 import logging
 from pathlib import Path
 
+import numpy as np
 import polars as pl
 from sklearn.linear_model import LogisticRegression
 from skl2onnx import convert_sklearn
 from skl2onnx.common.data_types import FloatTensorType
 
-from vp_track_status.constants import FEATURE_COLS, LABEL_MAPPING_INVERSE
+from vp_track_status.constants import FEATURE_COLS, LABEL_MAPPING
 from vp_track_status.features import add_rolling_features
+from vp_track_status.storage import scan_rainfall
 
 logger = logging.getLogger(__name__)
 
 
 def load_and_prepare_data(rainfall_file, observations_file):
-    df_rain = pl.read_csv(rainfall_file)
-    df_rain = df_rain.with_columns(pl.col("date").str.to_date()).sort("date")
+    df_rain = scan_rainfall(rainfall_file).sort("date").collect()
     df_rain = add_rolling_features(df_rain)
 
     df_obs = pl.read_csv(observations_file)
@@ -26,8 +27,13 @@ def load_and_prepare_data(rainfall_file, observations_file):
 
     df = df_rain.join(df_obs, on="date", how="inner").sort("date")
 
+    labels = pl.Enum(list(LABEL_MAPPING.values()))
     df = df.with_columns(
-        pl.col("State of the track").replace(LABEL_MAPPING_INVERSE).alias("target")
+        pl.col("State of the track")
+        .cast(labels)
+        .to_physical()
+        .cast(pl.Int64)
+        .alias("target")
     )
 
     return df
@@ -38,8 +44,9 @@ def train_model(df, feature_cols=None):
     if feature_cols is None:
         feature_cols = FEATURE_COLS
 
-    X = df.select(feature_cols).to_numpy()
-    y = df.select("target").to_numpy().ravel()
+    # lbfgs works in float64, so hand over C-contiguous float64 rows directly
+    X = df.select(pl.col(feature_cols).cast(pl.Float64)).to_numpy(order="c")
+    y = df["target"].to_numpy()
 
     model = LogisticRegression(max_iter=1000, random_state=42)
     model.fit(X, y)
@@ -48,15 +55,24 @@ def train_model(df, feature_cols=None):
 
 
 def export_to_onnx(model, feature_cols, output_path):
-    """Export trained model to ONNX format."""
+    """
+    Export trained model to ONNX format.
+
+    Returns the written path, or the serialized model bytes if output_path
+    is None.
+    """
     initial_type = [("float_input", FloatTensorType([None, len(feature_cols)]))]
 
     onnx_model = convert_sklearn(
         model,
         initial_types=initial_type,
         target_opset={"": 15, "ai.onnx.ml": 3},
+        options={id(model): {"zipmap": False}},
     )
 
+    if output_path is None:
+        return onnx_model.SerializeToString()
+
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -66,6 +82,21 @@ def export_to_onnx(model, feature_cols, output_path):
     return output_path
 
 
+def export_coefficients(model, output_path):
+    """Export linear model coefficients for NumPy inference."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    np.savez(
+        output_path,
+        coef=model.coef_.astype(np.float32),
+        intercept=model.intercept_.astype(np.float32),
+        classes=model.classes_,
+    )
+
+    return output_path
+
+
 def train_and_export(
     rainfall_file,
     observations_file,
@@ -74,13 +105,16 @@ def train_and_export(
 ):
     """Complete pipeline: load data, train model, export to ONNX."""
     df = load_and_prepare_data(rainfall_file, observations_file)
-    logger.info(f"Loaded {len(df)} observations with rainfall data")
+    logger.info("Loaded %d observations with rainfall data", len(df))
 
     model, feature_cols = train_model(df, feature_cols)
-    logger.info(f"Trained logistic regression model on {len(df)} samples")
-    logger.info(f"Features: {feature_cols}")
+    logger.info("Trained logistic regression model on %d samples", len(df))
+    logger.info("Features: %s", feature_cols)
 
     output_path = export_to_onnx(model, feature_cols, output_path)
-    logger.info(f"Model exported to {output_path}")
+    logger.info("Model exported to %s", output_path)
+
+    coefficients_path = export_coefficients(model, output_path.with_suffix(".npz"))
+    logger.info("Coefficients exported to %s", coefficients_path)
 
     return model, feature_cols
@@ -1,56 +1,164 @@
 """Predict current track conditions using trained model and latest rainfall data."""
 
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
-import onnxruntime as ort
-import polars as pl
+import polars.selectors as cs
 
 from vp_track_status.constants import (
     FEATURE_COLS,
+    FEATURE_WINDOWS,
     LABEL_MAPPING,
+    MAX_FEATURE_WINDOW,
     MODEL_FILE,
     RAINFALL_FILE,
 )
-from vp_track_status.features import add_rolling_features
+from vp_track_status.storage import RAINFALL_SCHEMA, scan_rainfall
 
 
-def predict_current_condition(
-    model_path=None,
-    rainfall_file=None,
-):
-    """Predict current track condition based on latest rainfall data."""
-    if model_path is None:
-        model_path = str(MODEL_FILE)
-    if rainfall_file is None:
-        rainfall_file = str(RAINFALL_FILE)
+@lru_cache(maxsize=4)
+def _load_session(model, mtime_ns):
+    """Build an optimised CPU inference session bound to a reusable input buffer."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # One tiny matmul per call: a single thread that sleeps instead of spinning
+    options.intra_op_num_threads = 1
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    session = ort.InferenceSession(
+        model, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+
+    # Bind the single-row input and label output once; calls refill the buffer,
+    # which the OrtValue wraps without copying
+    buffer = np.empty((1, len(FEATURE_COLS)), dtype=np.float32)
+    binding = session.io_binding()
+    binding.bind_ortvalue_input(
+        session.get_inputs()[0].name, ort.OrtValue.ortvalue_from_numpy(buffer)
+    )
+    binding.bind_output(session.get_outputs()[0].name)
+    return session, binding, buffer
+
+
+def _predict_onnx(model, features):
+    """Run ONNX Runtime on a model file path or serialized model bytes."""
+    if isinstance(model, bytes):
+        session, binding, buffer = _load_session(model, None)
+    else:
+        session, binding, buffer = _load_session(
+            str(model), Path(model).stat().st_mtime_ns
+        )
+    if features.shape[0] != 1:
+        # The export has a dynamic batch axis, so many rows go in one run
+        input_name = session.get_inputs()[0].name
+        return session.run(None, {input_name: features})[0]
+
+    buffer[:] = features
+    session.run_with_iobinding(binding)
+    return binding.get_outputs()[0].numpy()
+
+
+@lru_cache(maxsize=4)
+def _load_coefficients(coefficients_path, mtime_ns):
+    """Load exported coefficients once per file version, pre-transposed for matmul."""
+    with np.load(coefficients_path) as coefficients:
+        coef_t = np.ascontiguousarray(coefficients["coef"].T)
+        return coef_t, coefficients["intercept"], coefficients["classes"]
+
+
+def _predict_linear(coefficients_path, features):
+    """Apply exported logistic regression coefficients with NumPy."""
+    coef_t, intercept, classes = _load_coefficients(
+        str(coefficients_path), Path(coefficients_path).stat().st_mtime_ns
+    )
+    logits = features @ coef_t + intercept
+
+    if logits.shape[1] == 1:
+        indices = (logits[:, 0] > 0).astype(np.intp)
+    else:
+        indices = logits.argmax(axis=1)
+
+    return classes[indices]
+
+
+def predict_batch(model_path, features, model_bytes=None):
+    """
+    Predict integer track labels for an (n_rows, n_features) feature array.
+
+    Serialized ONNX model_bytes, when given, are used instead of model_path.
+    """
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    if model_bytes is not None:
+        return _predict_onnx(model_bytes, features).astype(np.int64)
 
-    if not Path(model_path).exists():
+    coefficients_path = Path(model_path).with_suffix(".npz")
+    if not coefficients_path.exists() and not Path(model_path).exists():
         raise FileNotFoundError(f"Model not found at {model_path}")
-    if not Path(rainfall_file).exists():
-        raise FileNotFoundError(f"Rainfall data not found at {rainfall_file}")
 
-    session = ort.InferenceSession(str(model_path))
+    # Prefer the exported coefficients; fall back to ONNX Runtime
+    if coefficients_path.exists():
+        labels = _predict_linear(coefficients_path, features)
+    else:
+        labels = _predict_onnx(model_path, features)
+    return labels.astype(np.int64)
 
-    df_rain = pl.read_csv(rainfall_file)
-    df_rain = df_rain.with_columns(pl.col("date").str.to_date()).sort("date")
-    df_rain = add_rolling_features(df_rain)
 
-    if df_rain.is_empty():
-        raise ValueError("No rainfall data available")
+def predict_from_rainfall(df_rain, model_path=None, model_bytes=None):
+    """
+    Predict track condition from daily rainfall sorted by date.
 
-    df_latest = df_rain.tail(1)
-    features = df_latest.select(FEATURE_COLS).to_numpy().astype(np.float32)
+    Uses the cached rain_Nd feature columns when present, otherwise computes
+    them from the trailing rainfall_mm values.
+    """
+    if model_path is None:
+        model_path = str(MODEL_FILE)
 
-    input_name = session.get_inputs()[0].name
-    label_name = session.get_outputs()[0].name
+    if df_rain.is_empty():
+        raise ValueError("No rainfall data available")
 
-    result = session.run([label_name], {input_name: features})
-    prediction = int(result[0][0])
+    if set(FEATURE_COLS).issubset(df_rain.columns):
+        # Features from the Parquet cache written by save_data
+        feature_values = df_rain.select(FEATURE_COLS).row(-1, named=True)
+    else:
+        # Window sums over the most recent days, matching add_rolling_features
+        recent_rain = df_rain["rainfall_mm"].fill_null(0.0).to_numpy()
+        feature_values = {
+            col: float(recent_rain[-size:].sum())
+            for col, size in zip(FEATURE_COLS, FEATURE_WINDOWS)
+        }
+    features = np.array([list(feature_values.values())], dtype=np.float32)
+    prediction = int(predict_batch(model_path, features, model_bytes)[0])
 
     return {
-        "date": df_latest["date"][0],
+        "date": df_rain["date"][-1],
         "prediction": prediction,
         "prediction_label": LABEL_MAPPING[prediction],
-        "features": {col: float(df_latest[col][0]) for col in FEATURE_COLS},
+        "features": feature_values,
     }
+
+
+def predict_current_condition(
+    model_path=None,
+    rainfall_file=None,
+    model_bytes=None,
+):
+    """Predict current track condition based on latest rainfall data."""
+    if rainfall_file is None:
+        rainfall_file = str(RAINFALL_FILE)
+
+    if not Path(rainfall_file).exists():
+        raise FileNotFoundError(f"Rainfall data not found at {rainfall_file}")
+
+    df_rain = (
+        scan_rainfall(rainfall_file)
+        .select(cs.by_name(*RAINFALL_SCHEMA, *FEATURE_COLS, require_all=False))
+        .sort("date")
+        .tail(MAX_FEATURE_WINDOW)
+        .collect()
+    )
+
+    return predict_from_rainfall(df_rain, model_path, model_bytes)
@@ -4,36 +4,150 @@ Fetch rainfall data from UK Environment Agency API.
 Supports fetching historical data and incremental updates with upsert logic.
 """
 
+import hashlib
+import io
 import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
+from itertools import islice, product
 from pathlib import Path
 
+import orjson
 import polars as pl
+import polars.selectors as cs
 import requests
+from requests.adapters import HTTPAdapter
 
 from vp_track_status.constants import (
     DEFAULT_STATION_ID,
+    FETCH_WINDOW_DAYS,
+    FETCH_WORKERS,
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_MAX_AGE_DAYS,
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUT,
     PARAMETER,
     RAINFALL_FILE,
     ROOT_URL,
 )
+from vp_track_status.features import add_rolling_features
+from vp_track_status.storage import (
+    RAINFALL_SCHEMA,
+    scan_rainfall,
+    write_parquet_cache,
+)
 
 logger = logging.getLogger(__name__)
 
+READINGS_SCHEMA = {"dateTime": pl.Utf8, "value": pl.Float64}
+# value is decoded as text: the API occasionally sends numbers as strings, and
+# the lenient cast afterwards turns odd readings into nulls, not failures
+READINGS_PAYLOAD_SCHEMA = {
+    "items": pl.List(pl.Struct({**READINGS_SCHEMA, "value": pl.Utf8}))
+}
+
+
+def create_session():
+    """Create an HTTP session with a connection pool sized for parallel fetches."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = create_session()
+
+
+def get_content(url, params, session=SESSION, cache_dir=HTTP_CACHE_DIR):
+    """
+    GET a response body, revalidating any cached copy with ETag/Last-Modified.
+
+    Responses carrying validators are stored under cache_dir; a 304 from the
+    server is answered from the stored body. Pass cache_dir=None to skip the
+    cache for URLs that are not requested again.
+    """
+    if cache_dir is None:
+        r = session.get(url, params=params, timeout=HTTP_TIMEOUT)
+        r.raise_for_status()
+        return r.content
+
+    key = hashlib.sha256(orjson.dumps([url, params], option=orjson.OPT_SORT_KEYS))
+    meta_file = Path(cache_dir) / f"{key.hexdigest()}.json"
+    body_file = meta_file.with_suffix(".body")
+
+    headers = {}
+    if meta_file.exists() and body_file.exists():
+        meta = orjson.loads(meta_file.read_bytes())
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    r = session.get(url, params=params, headers=headers, timeout=HTTP_TIMEOUT)
+    if r.status_code == 304:
+        # Mark the entry as in use so prune_http_cache keeps it
+        meta_file.touch()
+        return body_file.read_bytes()
+    r.raise_for_status()
+
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    if etag or last_modified:
+        meta_file.parent.mkdir(parents=True, exist_ok=True)
+        body_file.write_bytes(r.content)
+        meta_file.write_bytes(
+            orjson.dumps({"etag": etag, "last_modified": last_modified})
+        )
+
+    return r.content
+
+
+def prune_http_cache(cache_dir=HTTP_CACHE_DIR, max_age_days=HTTP_CACHE_MAX_AGE_DAYS):
+    """Evict cache entries that have not been stored or revalidated recently."""
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return
+
+    cutoff = time.time() - max_age_days * 24 * 60 * 60
+    for meta_file in cache_dir.glob("*.json"):
+        if meta_file.stat().st_mtime < cutoff:
+            meta_file.with_suffix(".body").unlink(missing_ok=True)
+            meta_file.unlink()
+
+
+def get_json(url, params, session=SESSION, cache_dir=HTTP_CACHE_DIR):
+    """GET and decode a JSON payload through the conditional-GET cache."""
+    return orjson.loads(get_content(url, params, session, cache_dir))
 
-def get_station_measures(station_id):
+
+def split_date_range(start_date, end_date, window_days=FETCH_WINDOW_DAYS):
+    """Split an inclusive YYYY-MM-DD date range into consecutive windows."""
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+
+    windows = []
+    while start <= end:
+        window_end = min(start + timedelta(days=window_days - 1), end)
+        windows.append((str(start), str(window_end)))
+        start = window_end + timedelta(days=1)
+
+    return windows
+
+
+def get_station_measures(station_id, session=SESSION):
     """Fetch all rainfall measure IDs for a given station."""
     url = f"{ROOT_URL}/id/stations/{station_id}/measures"
     params = {"parameter": PARAMETER, "_limit": 10000}
-    r = requests.get(url, params=params)
-    r.raise_for_status()
-    items = r.json().get("items", [])
+    items = get_json(url, params, session).get("items", [])
     measure_ids = [m["@id"] for m in items]
     return measure_ids
 
 
-def fetch_readings_for_measure(measure_id, start_date, end_date):
-    """Fetch all readings for a specific rainfall measure."""
+def fetch_readings_for_measure(measure_id, start_date, end_date, session=SESSION):
+    """Fetch all readings for a specific rainfall measure as a dateTime/value frame."""
     url = f"{measure_id}/readings"
     params = {
         "startdate": start_date,
@@ -41,18 +155,26 @@ def fetch_readings_for_measure(measure_id, start_date, end_date):
         "_limit": 10000,
         "_sorted": "",
     }
-    r = requests.get(url, params=params)
-    r.raise_for_status()
-    return r.json().get("items", [])
+    # Only windows that ended before today are requested again unchanged;
+    # ranges running up to today shift with every scheduled run
+    complete = date.fromisoformat(end_date) < date.today()
+    cache_dir = HTTP_CACHE_DIR if complete else None
+    content = get_content(url, params, session, cache_dir)
+    return (
+        pl.read_json(io.BytesIO(content), schema=READINGS_PAYLOAD_SCHEMA)
+        .explode("items")
+        .unnest("items")
+        .drop_nulls("dateTime")
+        .with_columns(pl.col("value").cast(pl.Float64, strict=False))
+    )
 
 
-def get_available_date_range(measure_id):
+def get_available_date_range(measure_id, session=SESSION):
     """Get the earliest and latest available dates for a measure."""
     url = f"{measure_id}/readings"
     params = {"_limit": 5000, "_sorted": ""}
-    r = requests.get(url, params=params)
-    r.raise_for_status()
-    readings = r.json().get("items", [])
+    # The latest readings change every few minutes, so never cache them
+    readings = get_json(url, params, session, cache_dir=None).get("items", [])
 
     if not readings:
         return None, None
@@ -64,95 +186,141 @@ def get_available_date_range(measure_id):
     return earliest, latest
 
 
-def fetch_rainfall_data(station_id, start_date, end_date):
-    """
-    Fetch all rainfall readings for a station between start_date and end_date.
+def _bounded_map(executor, fn, tasks, limit=FETCH_WORKERS):
+    """Like executor.map, but keep at most limit tasks submitted and unconsumed."""
+    tasks = iter(tasks)
+    pending = deque(executor.submit(fn, *task) for task in islice(tasks, limit))
+    while pending:
+        yield pending.popleft().result()
+        # Refill only once the caller has taken the previous result
+        for task in islice(tasks, 1):
+            pending.append(executor.submit(fn, *task))
 
-    Returns a Polars DataFrame with columns: dateTime, value
-    """
-    logger.info(f"Fetching rainfall data for station {station_id}")
-    logger.info(f"Date range requested: {start_date} to {end_date}")
+
+def _fetch_by_window(station_id, start_date, end_date, process):
+    """Fetch readings window by window, applying process to each window's frame."""
+    logger.info("Fetching rainfall data for station %s", station_id)
+    logger.info("Date range requested: %s to %s", start_date, end_date)
 
     measures = get_station_measures(station_id)
     if not measures:
         raise ValueError(f"No rainfall measures found for station {station_id}")
 
-    logger.info(f"Found {len(measures)} measure(s)")
+    logger.info("Found %d measure(s)", len(measures))
 
-    # Check available date range
-    earliest_available, latest_available = get_available_date_range(measures[0])
-    if earliest_available and latest_available:
-        logger.info(f"Data available from: {earliest_available} to {latest_available}")
+    # Fetch every (date window, measure) pair concurrently, alongside the
+    # available date range check, and process each window as it completes
+    windows = split_date_range(start_date, end_date)
+    tasks = [(measure, *window) for window, measure in product(windows, measures)]
+    results = []
+    total_readings = 0
+    # One extra worker for the date range check; no more threads than tasks
+    workers = min(FETCH_WORKERS, len(tasks) + 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        date_range = executor.submit(get_available_date_range, measures[0])
+        batches = _bounded_map(executor, fetch_readings_for_measure, tasks)
+
+        for _ in windows:
+            df_window = pl.concat(islice(batches, len(measures)))
+            total_readings += len(df_window)
+            results.append(process(df_window))
 
-    all_readings = []
-    for m in measures:
-        readings = fetch_readings_for_measure(m, start_date, end_date)
-        all_readings.extend(readings)
+        earliest_available, latest_available = date_range.result()
+
+    if earliest_available and latest_available:
+        logger.info(
+            "Data available from: %s to %s", earliest_available, latest_available
+        )
 
-    if not all_readings:
+    if total_readings == 0:
         logger.warning("No readings returned for this period")
         if earliest_available and latest_available:
             if start_date < earliest_available:
                 logger.warning(
-                    f"Requested start date ({start_date}) is before earliest available data ({earliest_available})"
+                    "Requested start date (%s) is before earliest available data (%s)",
+                    start_date,
+                    earliest_available,
                 )
             if end_date > latest_available:
                 logger.warning(
-                    f"Requested end date ({end_date}) is after latest available data ({latest_available})"
+                    "Requested end date (%s) is after latest available data (%s)",
+                    end_date,
+                    latest_available,
                 )
             logger.info(
-                f"Try using dates between {earliest_available} and {latest_available}"
+                "Try using dates between %s and %s",
+                earliest_available,
+                latest_available,
             )
-        return pl.DataFrame(schema={"dateTime": pl.Utf8, "value": pl.Float64})
+    else:
+        logger.info("Retrieved %d readings", total_readings)
+
+    return results
+
+
+def fetch_rainfall_data(station_id, start_date, end_date):
+    """
+    Fetch all rainfall readings for a station between start_date and end_date.
 
-    df_readings = pl.DataFrame(all_readings)
-    logger.info(f"Retrieved {len(df_readings)} readings")
-    return df_readings.select(["dateTime", "value"])
+    Returns a Polars DataFrame with columns: dateTime, value
+    """
+    frames = _fetch_by_window(station_id, start_date, end_date, lambda df: df)
+    if not frames:
+        return pl.DataFrame(schema=READINGS_SCHEMA)
+    return pl.concat(frames)
+
+
+def fetch_daily_rainfall(station_id, start_date, end_date):
+    """
+    Fetch daily rainfall totals for a station between start_date and end_date.
+
+    Each date window is aggregated as soon as it is fetched, so only one
+    window of raw readings is held at a time.
+
+    Returns a Polars DataFrame with columns: date, rainfall_mm
+    """
+    frames = _fetch_by_window(station_id, start_date, end_date, aggregate_daily)
+    if not frames:
+        return pl.DataFrame(schema=RAINFALL_SCHEMA)
+    return pl.concat(frames).sort("date")
 
 
 def aggregate_daily(df):
     """
     Aggregate rainfall data to daily totals.
 
+    Accepts a DataFrame or LazyFrame with columns: dateTime, value
     Returns a Polars DataFrame with columns: date, rainfall_mm
     """
-    if df.is_empty():
-        return pl.DataFrame(schema={"date": pl.Date, "rainfall_mm": pl.Float64})
-
     df_daily = (
-        df.with_columns(
-            [
-                pl.col("dateTime")
-                .str.strptime(pl.Datetime, "%Y-%m-%dT%H:%M:%SZ")
-                .alias("dateTime"),
-                pl.col("value").cast(pl.Float64, strict=False).alias("value"),
-            ]
+        df.lazy()
+        .select(
+            pl.col("dateTime")
+            .str.strptime(pl.Date, "%Y-%m-%dT%H:%M:%SZ", strict=False)
+            .alias("date"),
+            pl.col("value").cast(pl.Float64, strict=False),
         )
-        .drop_nulls(subset=["value", "dateTime"])
-        .with_columns(pl.col("dateTime").dt.date().alias("date"))
+        .drop_nulls()
         .group_by("date")
         .agg(pl.col("value").sum().alias("rainfall_mm"))
         .sort("date")
+        .collect(engine="streaming")
     )
 
     return df_daily
 
 
 def load_existing_data(output_file):
-    """Load existing CSV data if it exists."""
+    """Load existing rainfall data if it exists."""
     path = Path(output_file)
     if not path.exists():
-        return pl.DataFrame(schema={"date": pl.Date, "rainfall_mm": pl.Float64})
+        return pl.DataFrame(schema=RAINFALL_SCHEMA)
 
-    df_existing = pl.read_csv(output_file, try_parse_dates=True)
-    # Ensure date column is Date type (may already be parsed)
-    if "date" in df_existing.columns and df_existing["date"].dtype != pl.Date:
-        df_existing = df_existing.with_columns(pl.col("date").str.to_date())
-
-    # Only keep base columns, drop any derived columns (rolling windows)
-    base_columns = ["date", "rainfall_mm"]
-    df_existing = df_existing.select(
-        [col for col in base_columns if col in df_existing.columns]
+    # Only keep base columns, drop the rolling features the Parquet cache carries
+    df_existing = (
+        scan_rainfall(path)
+        .select(cs.by_name(*RAINFALL_SCHEMA, require_all=False))
+        .collect()
     )
 
     return df_existing
@@ -170,22 +338,84 @@ def upsert_data(existing_df, new_df):
     if new_df.is_empty():
         return existing_df
 
-    # Combine and keep latest values (new data overwrites old)
+    # Anti-join away existing rows superseded by new data, then append the
+    # new rows, as one lazy plan
+    lf_new = new_df.lazy()
     df_combined = (
-        pl.concat([existing_df, new_df])
-        .unique(subset=["date"], keep="last")
+        pl.concat(
+            [
+                existing_df.lazy().join(lf_new.select("date"), on="date", how="anti"),
+                lf_new,
+            ]
+        )
         .sort("date")
+        .collect()
     )
 
     return df_combined
 
 
 def save_data(df, output_file):
-    """Save DataFrame to CSV."""
+    """
+    Save DataFrame to CSV, plus a Parquet cache for fast typed reads.
+
+    The CSV holds only date and rainfall_mm. The cache also carries the
+    rolling rainfall features, so predictions can read them instead of
+    recomputing; being tied to the CSV's digest, they always match it.
+    """
     path = Path(output_file)
     path.parent.mkdir(parents=True, exist_ok=True)
     df.write_csv(path)
-    logger.info(f"Saved {len(df)} daily records to {output_file}")
+    write_parquet_cache(add_rolling_features(df), path)
+    logger.info("Saved %d daily records to %s", len(df), output_file)
+
+
+def save_data_from(df, since, output_file):
+    """
+    Rewrite the CSV from the first row dated on or after since.
+
+    Rows before since are left in place, so only the changed tail of the file
+    is written; the Parquet cache is refreshed from the full frame. A CSV
+    that is out of date order or lacks its final newline, as after a hand
+    edit, is rewritten in full with save_data instead.
+    """
+    path = Path(output_file)
+    since_key = str(since).encode()
+    with path.open("r+b") as f:
+        line = f.readline()  # header
+        offset = None
+        previous_key = b""
+        ordered = True
+        while True:
+            position = f.tell()
+            next_line = f.readline()
+            if not next_line:
+                break
+            line = next_line
+            key = line.split(b",", 1)[0]
+            if key < previous_key:
+                ordered = False
+                break
+            previous_key = key
+            if offset is None and key >= since_key:
+                offset = position
+
+        if ordered and line.endswith(b"\n"):
+            f.seek(f.tell() if offset is None else offset)
+            f.truncate()
+            df_tail = df.filter(pl.col("date") >= since)
+            df_tail.write_csv(f, include_header=False)
+            rewritable = True
+        else:
+            rewritable = False
+
+    if not rewritable:
+        logger.info("%s is not sorted and newline-terminated, rewriting it", path)
+        save_data(df, path)
+        return
+
+    write_parquet_cache(add_rolling_features(df), path)
+    logger.info("Rewrote %d daily records from %s in %s", len(df_tail), since, path)
 
 
 def fetch_and_update(
@@ -225,20 +455,17 @@ def fetch_and_update(
     else:  # latest mode
         start_date = str(today - timedelta(days=days))
 
-    logger.info(f"Rainfall Data Fetch - {mode.upper()} mode")
-
-    # Fetch raw data
-    raw_df = fetch_rainfall_data(station_id, start_date, end_date)
+    logger.info("Rainfall Data Fetch - %s mode", mode.upper())
+    prune_http_cache()
 
-    # Aggregate to daily
-    logger.info("Aggregating to daily totals...")
-    daily_df = aggregate_daily(raw_df)
-    logger.info(f"Aggregated to {len(daily_df)} days")
+    # Fetch and aggregate to daily, one date window at a time
+    daily_df = fetch_daily_rainfall(station_id, start_date, end_date)
+    logger.info("Aggregated to %d days", len(daily_df))
 
     # Load existing data
-    logger.info(f"Loading existing data from {output_file}...")
+    logger.info("Loading existing data from %s...", output_file)
     existing_df = load_existing_data(output_file)
-    logger.info(f"Found {len(existing_df)} existing records")
+    logger.info("Found %d existing records", len(existing_df))
 
     # Upsert
     logger.info("Merging data...")
@@ -247,21 +474,32 @@ def fetch_and_update(
     # Show summary of changes
     new_records = len(final_df) - len(existing_df)
     if new_records > 0:
-        logger.info(f"Added {new_records} new record(s)")
+        logger.info("Added %d new record(s)", new_records)
 
     # Count updated records
     if not daily_df.is_empty() and not existing_df.is_empty():
-        existing_dates = set(existing_df["date"].to_list())
-        new_dates = set(daily_df["date"].to_list())
-        updated_records = len(existing_dates & new_dates)
+        updated_records = existing_df.join(
+            daily_df.select("date"), on="date", how="semi"
+        ).height
         if updated_records > 0:
-            logger.info(f"Updated {updated_records} existing record(s)")
-
-    # Save
-    save_data(final_df, output_file)
+            logger.info("Updated %d existing record(s)", updated_records)
+
+    # Save, rewriting the CSV only from the first fetched day when it already
+    # holds the stored history in the layout save_data writes
+    rewritable = (
+        not existing_df.is_empty()
+        and Path(output_file).exists()
+        and pl.scan_csv(output_file).collect_schema().names() == list(RAINFALL_SCHEMA)
+    )
+    if rewritable and daily_df.is_empty():
+        logger.info("No new records to save")
+    elif rewritable:
+        save_data_from(final_df, daily_df["date"].min(), output_file)
+    else:
+        save_data(final_df, output_file)
 
     # Show recent data
-    logger.info(f"Most recent data:\n{final_df.tail(10)}")
+    logger.info("Most recent data:\n%s", final_df.tail(10))
     logger.info("Data fetch completed successfully")
 
     return final_df
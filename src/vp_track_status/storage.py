@@ -0,0 +1,54 @@
+"""Read access to the daily rainfall store and its Parquet cache."""
+
+import hashlib
+from pathlib import Path
+
+import polars as pl
+
+RAINFALL_SCHEMA = {"date": pl.Date, "rainfall_mm": pl.Float64}
+
+# Parquet metadata key recording which CSV content a cache was written from
+_CSV_DIGEST_KEY = "csv_sha256"
+
+
+def parquet_path(rainfall_file):
+    """Path of the Parquet cache kept alongside a rainfall CSV."""
+    return Path(rainfall_file).with_suffix(".parquet")
+
+
+def _csv_digest(csv_file):
+    return hashlib.sha256(Path(csv_file).read_bytes()).hexdigest()
+
+
+def write_parquet_cache(df, rainfall_file):
+    """Cache df as Parquet, tagged with the digest of the CSV it mirrors."""
+    df.write_parquet(
+        parquet_path(rainfall_file),
+        metadata={_CSV_DIGEST_KEY: _csv_digest(rainfall_file)},
+    )
+
+
+def _cache_is_current(csv_file, parquet_file):
+    if not parquet_file.exists():
+        return False
+    metadata = pl.read_parquet_metadata(parquet_file)
+    return metadata.get(_CSV_DIGEST_KEY) == _csv_digest(csv_file)
+
+
+def scan_rainfall(rainfall_file):
+    """
+    Lazily scan daily rainfall from the CSV store.
+
+    The CSV is authoritative; its Parquet cache is read instead only when it
+    was written from the CSV's current content. Only the cache carries the
+    rolling features: any other CSV columns are dropped rather than trusted.
+    """
+    csv_file = Path(rainfall_file)
+    parquet_file = parquet_path(csv_file)
+
+    if _cache_is_current(csv_file, parquet_file):
+        return pl.scan_parquet(parquet_file)
+
+    return pl.scan_csv(csv_file, schema_overrides=RAINFALL_SCHEMA).select(
+        list(RAINFALL_SCHEMA)
+    )
@@ -1,72 +1,48 @@
 """Generate static website displaying current track conditions."""
 
+import logging
 from datetime import datetime
 from pathlib import Path
+from string import Template
 
 import polars as pl
+import polars.selectors as cs
 
-from vp_track_status.constants import RAINFALL_FILE
-from vp_track_status.predict import predict_current_condition
+from vp_track_status.constants import (
+    FEATURE_COLS,
+    MAX_FEATURE_WINDOW,
+    MODEL_FILE,
+    RAINFALL_FILE,
+)
+from vp_track_status.predict import predict_from_rainfall
+from vp_track_status.storage import RAINFALL_SCHEMA, scan_rainfall
 
+logger = logging.getLogger(__name__)
 
-def generate_html(prediction_result, rainfall_data):
-    """Generate HTML page from prediction and rainfall data."""
-    condition = prediction_result["prediction_label"]
-    date = prediction_result["date"]
-    features = prediction_result["features"]
+RECENT_DAYS = 7
 
-    condition_colors = {
-        "Dry": "#22c55e",
-        "Some puddles": "#f59e0b",
-        "Lots puddles": "#ef4444",
-    }
-    condition_descriptions = {
-        "Dry": "Good conditions to run a workout on the athletics track.",
-        "Some puddles": "Possible to run workout on the athletics track, but you will likely have to dodge puddles and swerve lanes.",
-        "Lots puddles": "The athletics track is very water logged, you might as well run in your bathtub.",
-    }
-
-    color = condition_colors.get(condition, "#6b7280")
-    description = condition_descriptions.get(condition, "")
-
-    recent_rain = (
-        rainfall_data.tail(7)
-        .select(["date", "rainfall_mm"])
-        .with_columns(pl.col("date").dt.strftime("%Y-%m-%d").alias("date"))
-        .reverse()
-    )
-
-    # Calculate max rainfall for bar chart scaling
-    max_rainfall = max(row["rainfall_mm"] for row in recent_rain.iter_rows(named=True))
-    if max_rainfall == 0:
-        max_rainfall = 1
-
-    # Build rainfall bars
-    rain_bars = ""
-    for row in recent_rain.iter_rows(named=True):
-        width_pct = (row["rainfall_mm"] / max_rainfall) * 100 if max_rainfall > 0 else 0
-        rain_bars += f"""
+_RAIN_ROW = """
         <div class="rain-row">
-            <div class="rain-date">{row["date"]}</div>
+            <div class="rain-date">{day}</div>
             <div class="rain-bar-container">
-                <div class="rain-bar" style="width: {width_pct}%"></div>
+                <div class="rain-bar" style="width: {width}%"></div>
             </div>
-            <div class="rain-value">{row["rainfall_mm"]:.1f} mm</div>
+            <div class="rain-value">{rain:.1f} mm</div>
         </div>"""
 
-    html = f"""<!DOCTYPE html>
+_PAGE_TEMPLATE = Template("""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Victoria Park Athletics Track Status</title>
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
-        body {{
+        }
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', sans-serif;
             background: #ffffff;
             color: #000000;
@@ -74,166 +50,166 @@ def generate_html(prediction_result, rainfall_data):
             padding: 30px 40px;
             max-width: 900px;
             margin: 0 auto;
-        }}
-        .accent-bar {{
+        }
+        .accent-bar {
             position: fixed;
             left: 0;
             top: 0;
             width: 8px;
             height: 100vh;
-            background: {color};
-        }}
-        .header {{
+            background: $color;
+        }
+        .header {
             margin-bottom: 30px;
-        }}
-        h1 {{
+        }
+        h1 {
             font-size: 2.5em;
             font-weight: 700;
             letter-spacing: -0.02em;
             color: #000000;
-        }}
-        .subtitle {{
+        }
+        .subtitle {
             font-size: 0.85em;
             color: #999999;
             margin-top: 8px;
             letter-spacing: 0.02em;
-        }}
-        .subtitle a {{
+        }
+        .subtitle a {
             color: #666666;
             text-decoration: none;
             border-bottom: 1px solid #e0e0e0;
-        }}
-        .subtitle a:hover {{
+        }
+        .subtitle a:hover {
             color: #000000;
             border-bottom: 1px solid #000000;
-        }}
-        .status-section {{
+        }
+        .status-section {
             margin-bottom: 50px;
             border-top: 1px solid #000000;
             padding-top: 30px;
-        }}
-        .status-label {{
+        }
+        .status-label {
             font-size: 0.75em;
             text-transform: uppercase;
             letter-spacing: 0.1em;
             color: #666666;
             margin-bottom: 12px;
             font-weight: 500;
-        }}
-        .status-value {{
+        }
+        .status-value {
             font-size: 3em;
             font-weight: 700;
-            color: {color};
+            color: $color;
             margin-bottom: 16px;
             letter-spacing: -0.02em;
-        }}
-        .status-description {{
+        }
+        .status-description {
             font-size: 1.1em;
             color: #333333;
             line-height: 1.7;
             max-width: 600px;
-        }}
-        .data-section {{
+        }
+        .data-section {
             margin-bottom: 60px;
-        }}
-        .section-title {{
+        }
+        .section-title {
             font-size: 0.75em;
             text-transform: uppercase;
             letter-spacing: 0.1em;
             color: #666666;
             margin-bottom: 20px;
             font-weight: 500;
-        }}
-        .metrics {{
+        }
+        .metrics {
             display: grid;
             grid-template-columns: repeat(3, 1fr);
             gap: 30px;
             margin-bottom: 60px;
-        }}
-        .metric {{
+        }
+        .metric {
             border-left: 3px solid #000000;
             padding-left: 16px;
-        }}
-        .metric-label {{
+        }
+        .metric-label {
             font-size: 0.85em;
             color: #666666;
             margin-bottom: 8px;
-        }}
-        .metric-value {{
+        }
+        .metric-value {
             font-size: 2.2em;
             font-weight: 700;
             color: #000000;
             letter-spacing: -0.02em;
-        }}
-        .metric-unit {{
+        }
+        .metric-unit {
             font-size: 0.5em;
             color: #666666;
             font-weight: 400;
             margin-left: 4px;
-        }}
-        .rain-row {{
+        }
+        .rain-row {
             display: grid;
             grid-template-columns: 100px 1fr 90px;
             align-items: center;
             gap: 16px;
             margin-bottom: 16px;
-        }}
-        .rain-date {{
+        }
+        .rain-date {
             font-size: 0.95em;
             color: #666666;
             font-variant-numeric: tabular-nums;
-        }}
-        .rain-bar-container {{
+        }
+        .rain-bar-container {
             height: 8px;
             background: #f0f0f0;
-        }}
-        .rain-bar {{
+        }
+        .rain-bar {
             height: 100%;
             background: #000000;
             transition: width 0.3s ease;
-        }}
-        .rain-value {{
+        }
+        .rain-value {
             font-size: 0.95em;
             font-weight: 600;
             color: #000000;
             text-align: right;
             font-variant-numeric: tabular-nums;
-        }}
-        .footer {{
+        }
+        .footer {
             margin-top: 40px;
             padding-top: 20px;
             border-top: 1px solid #e0e0e0;
             font-size: 0.85em;
             color: #999999;
             line-height: 1.8;
-        }}
-        .footer a {{
+        }
+        .footer a {
             color: #000000;
             text-decoration: none;
             border-bottom: 1px solid #cccccc;
-        }}
-        .footer a:hover {{
+        }
+        .footer a:hover {
             border-bottom: 1px solid #000000;
-        }}
-        @media (max-width: 768px) {{
-            body {{
+        }
+        @media (max-width: 768px) {
+            body {
                 padding: 40px 24px;
-            }}
-            h1 {{
+            }
+            h1 {
                 font-size: 2em;
-            }}
-            .status-value {{
+            }
+            .status-value {
                 font-size: 2.2em;
-            }}
-            .metrics {{
+            }
+            .metrics {
                 grid-template-columns: 1fr;
                 gap: 20px;
-            }}
-            .rain-row {{
+            }
+            .rain-row {
                 grid-template-columns: 90px 1fr 70px;
                 gap: 12px;
-            }}
-        }}
+            }
+        }
     </style>
 </head>
 <body>
@@ -247,9 +223,9 @@ def generate_html(prediction_result, rainfall_data):
     </div>
 
     <div class="status-section">
-        <div class="status-label">Track Condition for {date}</div>
-        <div class="status-value">{condition}</div>
-        <div class="status-description">{description}</div>
+        <div class="status-label">Track Condition for $date</div>
+        <div class="status-value">$condition</div>
+        <div class="status-description">$description</div>
     </div>
 
     <div class="data-section">
@@ -257,52 +233,132 @@ def generate_html(prediction_result, rainfall_data):
         <div class="metrics">
             <div class="metric">
                 <div class="metric-label">Last 24h</div>
-                <div class="metric-value">{features["rain_1d"]:.1f}<span class="metric-unit">mm</span></div>
+                <div class="metric-value">$rain_1d<span class="metric-unit">mm</span></div>
             </div>
             <div class="metric">
                 <div class="metric-label">Last 3 days</div>
-                <div class="metric-value">{features["rain_3d"]:.1f}<span class="metric-unit">mm</span></div>
+                <div class="metric-value">$rain_3d<span class="metric-unit">mm</span></div>
             </div>
             <div class="metric">
                 <div class="metric-label">Last 7 days</div>
-                <div class="metric-value">{features["rain_7d"]:.1f}<span class="metric-unit">mm</span></div>
+                <div class="metric-value">$rain_7d<span class="metric-unit">mm</span></div>
             </div>
         </div>
     </div>
 
     <div class="data-section">
         <div class="section-title">Recent Rainfall</div>
-        {rain_bars}
+        $rain_bars
     </div>
 
     <div class="footer">
-        Last updated: {datetime.now().strftime("%Y-%m-%d %H:%M UTC")}<br>
+        Last updated: $updated<br>
         Predictions use AI trained on puddle observations and rainfall data from <a href="https://environment.data.gov.uk/flood-monitoring/doc/reference" target="_blank">UK Environment Agency</a><br>
         <a href="https://github.com/CDonnerer/vp-track-status" target="_blank">View source on GitHub</a>
     </div>
 </body>
-</html>"""
+</html>""")
 
-    return html
 
+def generate_html(prediction_result, rainfall_data):
+    """Generate HTML page from prediction and rainfall data."""
+    condition = prediction_result["prediction_label"]
+    date = prediction_result["date"]
+    features = prediction_result["features"]
 
-def generate_site(output_dir=None):
-    """Generate static website with current track conditions."""
+    condition_colors = {
+        "Dry": "#22c55e",
+        "Some puddles": "#f59e0b",
+        "Lots puddles": "#ef4444",
+    }
+    condition_descriptions = {
+        "Dry": "Good conditions to run a workout on the athletics track.",
+        "Some puddles": "Possible to run workout on the athletics track, but you will likely have to dodge puddles and swerve lanes.",
+        "Lots puddles": "The athletics track is very water logged, you might as well run in your bathtub.",
+    }
+
+    color = condition_colors.get(condition, "#6b7280")
+    description = condition_descriptions.get(condition, "")
+
+    recent_rain = rainfall_data.tail(RECENT_DAYS)
+
+    # Scale bars to the wettest day, guarding against an all-dry week
+    max_rainfall = recent_rain["rainfall_mm"].max() or 1.0
+
+    # Format every bar's fields in Polars, then fill the row markup newest first
+    rain_rows = recent_rain.select(
+        pl.col("date").dt.strftime("%Y-%m-%d"),
+        (pl.col("rainfall_mm") / max_rainfall * 100).round(1).alias("width"),
+        pl.col("rainfall_mm").alias("rain"),
+    )
+    rain_bars = "".join(
+        _RAIN_ROW.format(day=day, width=width, rain=rain)
+        for day, width, rain in rain_rows.rows()[::-1]
+    )
+
+    return _PAGE_TEMPLATE.substitute(
+        color=color,
+        date=date,
+        condition=condition,
+        description=description,
+        rain_1d=f"{features['rain_1d']:.1f}",
+        rain_3d=f"{features['rain_3d']:.1f}",
+        rain_7d=f"{features['rain_7d']:.1f}",
+        rain_bars=rain_bars,
+        updated=datetime.now().strftime("%Y-%m-%d %H:%M UTC"),
+    )
+
+
+def _is_up_to_date(output_file):
+    """Whether output_file is newer than the rainfall store, model and template."""
+    if not output_file.exists():
+        return False
+
+    inputs = [
+        RAINFALL_FILE,
+        MODEL_FILE,
+        MODEL_FILE.with_suffix(".npz"),
+        Path(__file__),
+    ]
+    output_mtime = output_file.stat().st_mtime
+    return all(path.stat().st_mtime <= output_mtime for path in inputs if path.exists())
+
+
+def generate_site(output_dir=None, force=False):
+    """
+    Generate static website with current track conditions.
+
+    Skips the prediction and render when the existing page is newer than all
+    of its inputs, unless force is set. Returns the page path and whether it
+    was rendered.
+    """
     if output_dir is None:
         output_dir = Path("docs")
     else:
         output_dir = Path(output_dir)
 
     output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / "index.html"
 
-    prediction = predict_current_condition()
+    if not RAINFALL_FILE.exists():
+        raise FileNotFoundError(f"Rainfall data not found at {RAINFALL_FILE}")
 
-    rainfall_data = pl.read_csv(RAINFALL_FILE)
-    rainfall_data = rainfall_data.with_columns(pl.col("date").str.to_date())
+    if not force and _is_up_to_date(output_file):
+        logger.info("%s is newer than its inputs, skipping generation", output_file)
+        return output_file, False
+
+    # Read the recent rainfall once and share it between prediction and page
+    rainfall_data = (
+        scan_rainfall(RAINFALL_FILE)
+        .select(cs.by_name(*RAINFALL_SCHEMA, *FEATURE_COLS, require_all=False))
+        .sort("date")
+        .tail(max(RECENT_DAYS, MAX_FEATURE_WINDOW))
+        .collect()
+    )
+    prediction = predict_from_rainfall(rainfall_data, model_path=MODEL_FILE)
 
     html = generate_html(prediction, rainfall_data)
 
-    output_file = output_dir / "index.html"
     output_file.write_text(html)
 
-    return output_file
+    return output_file, True
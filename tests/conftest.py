@@ -4,7 +4,7 @@ import polars as pl
 import pytest
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_rainfall_data():
     return pl.DataFrame(
         {
@@ -14,7 +14,7 @@ def sample_rainfall_data():
     ).with_columns(pl.col("date").str.to_date())
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_training_data():
     return pl.DataFrame(
         {
@@ -26,3 +26,19 @@ def sample_training_data():
             "target": [0, 1, 2],
         }
     )
+
+
+@pytest.fixture(scope="session")
+def trained_model(sample_training_data):
+    # Imported here so modules without model tests run without the train group
+    from vp_track_status.model import train_model
+
+    return train_model(sample_training_data)
+
+
+@pytest.fixture(scope="session")
+def onnx_model_bytes(trained_model):
+    from vp_track_status.model import export_to_onnx
+
+    model, feature_cols = trained_model
+    return export_to_onnx(model, feature_cols, None)
@@ -1,5 +1,10 @@
 """Tests for feature engineering."""
 
+from datetime import date, timedelta
+
+import polars as pl
+import pytest
+
 from vp_track_status.features import add_rolling_features
 
 
@@ -10,3 +15,20 @@ def test_add_rolling_features(sample_rainfall_data):
     assert "rain_7d" in result.columns
     assert result["rain_1d"][0] == 5.0
     assert result["rain_2d"][1] == 15.0
+
+
+def test_add_rolling_features_treats_missing_days_as_dry():
+    rainfall = [1.0, None, 2.0, 0.0, 0.1, 0.0, 0.0, 1.0]
+    df_rain = pl.DataFrame(
+        {
+            "date": [date(2024, 1, 1) + timedelta(days=i) for i in range(8)],
+            "rainfall_mm": rainfall,
+        }
+    )
+
+    result = add_rolling_features(df_rain)
+
+    expected = (
+        df_rain["rainfall_mm"].rolling_sum(3, min_samples=1).fill_null(0.0).to_list()
+    )
+    assert result["rain_3d"].to_list() == pytest.approx(expected)
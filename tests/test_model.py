@@ -1,6 +1,9 @@
 """Tests for model training."""
 
-from vp_track_status.model import train_model
+import numpy as np
+
+from vp_track_status.model import export_coefficients, train_model
+from vp_track_status.predict import predict_batch
 
 
 def test_train_model(sample_training_data):
@@ -9,3 +12,17 @@ def test_train_model(sample_training_data):
     assert model is not None
     assert len(feature_cols) == 5
     assert model.predict([[5.0, 5.0, 5.0, 5.0, 5.0]]).shape == (1,)
+
+
+def test_exported_coefficients_match_sklearn(trained_model, tmp_path):
+    model, feature_cols = trained_model
+    coefficients_path = tmp_path / "model.npz"
+    export_coefficients(model, coefficients_path)
+
+    rng = np.random.default_rng(0)
+    features = rng.uniform(0, 30, size=(200, len(feature_cols))).astype(np.float32)
+
+    np.testing.assert_array_equal(
+        predict_batch(coefficients_path.with_suffix(".onnx"), features),
+        model.predict(features),
+    )
@@ -1,28 +1,98 @@
 """Tests for prediction module."""
 
-import tempfile
-from pathlib import Path
+import numpy as np
 
-from vp_track_status.model import train_model, export_to_onnx
-from vp_track_status.predict import predict_current_condition
+from vp_track_status.model import export_coefficients, export_to_onnx
+from vp_track_status.predict import predict_batch, predict_current_condition
+from vp_track_status.rainfall import save_data
 
 
-def test_predict_current_condition(sample_rainfall_data, sample_training_data):
-    with tempfile.TemporaryDirectory() as tmpdir:
-        rainfall_file = Path(tmpdir) / "rainfall.csv"
-        model_file = Path(tmpdir) / "model.onnx"
+def test_predict_current_condition(sample_rainfall_data, onnx_model_bytes, tmp_path):
+    rainfall_file = tmp_path / "rainfall.csv"
+    sample_rainfall_data.write_csv(rainfall_file)
 
-        sample_rainfall_data.write_csv(rainfall_file)
+    result = predict_current_condition(
+        rainfall_file=str(rainfall_file),
+        model_bytes=onnx_model_bytes,
+    )
 
-        model, feature_cols = train_model(sample_training_data)
-        export_to_onnx(model, feature_cols, model_file)
+    assert "date" in result
+    assert "prediction" in result
+    assert "prediction_label" in result
+    assert result["prediction"] in [0, 1, 2]
 
-        result = predict_current_condition(
-            model_path=str(model_file),
-            rainfall_file=str(rainfall_file),
-        )
 
-        assert "date" in result
-        assert "prediction" in result
-        assert "prediction_label" in result
-        assert result["prediction"] in [0, 1, 2]
+def test_predict_with_coefficients_matches_onnx(
+    sample_rainfall_data, trained_model, tmp_path
+):
+    rainfall_file = tmp_path / "rainfall.csv"
+    model_file = tmp_path / "model.onnx"
+
+    sample_rainfall_data.write_csv(rainfall_file)
+
+    model, feature_cols = trained_model
+    export_to_onnx(model, feature_cols, model_file)
+    onnx_result = predict_current_condition(model_file, rainfall_file)
+
+    export_coefficients(model, model_file.with_suffix(".npz"))
+    numpy_result = predict_current_condition(model_file, rainfall_file)
+
+    assert numpy_result["prediction"] == onnx_result["prediction"]
+
+
+def test_predict_reads_stored_features(sample_rainfall_data, trained_model, tmp_path):
+    base_file = tmp_path / "base.csv"
+    stored_file = tmp_path / "stored.csv"
+    model_file = tmp_path / "model.onnx"
+
+    sample_rainfall_data.write_csv(base_file)
+    save_data(sample_rainfall_data, stored_file)
+    assert stored_file.read_text().splitlines()[0] == "date,rainfall_mm"
+
+    model, _ = trained_model
+    export_coefficients(model, model_file.with_suffix(".npz"))
+
+    computed = predict_current_condition(model_file, base_file)
+    stored = predict_current_condition(model_file, stored_file)
+
+    assert stored["features"] == computed["features"]
+    assert stored["prediction"] == computed["prediction"]
+
+
+def test_predict_ignores_features_stored_in_csv(trained_model, tmp_path):
+    base_file = tmp_path / "base.csv"
+    legacy_file = tmp_path / "legacy.csv"
+    model_file = tmp_path / "model.onnx"
+
+    base_file.write_text("date,rainfall_mm\n2024-01-01,20.0\n")
+    # Derived columns left over from an older layout, out of step with rainfall
+    legacy_file.write_text(
+        "date,rainfall_mm,rain_1d,rain_2d,rain_3d,rain_5d,rain_7d\n"
+        "2024-01-01,20.0,0.0,0.0,0.0,0.0,0.0\n"
+    )
+
+    model, _ = trained_model
+    export_coefficients(model, model_file.with_suffix(".npz"))
+
+    computed = predict_current_condition(model_file, base_file)
+    legacy = predict_current_condition(model_file, legacy_file)
+
+    assert legacy["features"]["rain_1d"] == 20.0
+    assert legacy == computed
+
+
+def test_predict_batch_matches_across_backends(
+    sample_training_data, trained_model, tmp_path
+):
+    model_file = tmp_path / "model.onnx"
+    model, feature_cols = trained_model
+    export_to_onnx(model, feature_cols, model_file)
+
+    features = sample_training_data.select(feature_cols).to_numpy()
+    onnx_labels = predict_batch(model_file, features)
+
+    export_coefficients(model, model_file.with_suffix(".npz"))
+    numpy_labels = predict_batch(model_file, features)
+
+    assert onnx_labels.shape == (len(features),)
+    np.testing.assert_array_equal(numpy_labels, onnx_labels)
@@ -1,35 +1,261 @@
 """Tests for rainfall data fetching."""
 
+import json
+import os
+from datetime import date, timedelta
 from unittest.mock import Mock, patch
 
-from vp_track_status.rainfall import fetch_rainfall_data
+import polars as pl
+import pytest
+
+from vp_track_status.constants import FETCH_WINDOW_DAYS
+from vp_track_status.features import add_rolling_features
+from vp_track_status.rainfall import (
+    SESSION,
+    aggregate_daily,
+    fetch_daily_rainfall,
+    fetch_rainfall_data,
+    fetch_readings_for_measure,
+    get_available_date_range,
+    get_json,
+    load_existing_data,
+    prune_http_cache,
+    save_data,
+    save_data_from,
+    split_date_range,
+    upsert_data,
+)
+from vp_track_status.storage import RAINFALL_SCHEMA
+
+
+def _mock_response(payload, status_code=200, headers=None):
+    response = Mock(status_code=status_code, headers=headers or {})
+    response.content = json.dumps(payload).encode()
+    response.json.return_value = payload
+    response.raise_for_status = Mock()
+    return response
 
 
 def test_fetch_rainfall_data():
-    mock_measures_response = Mock()
-    mock_measures_response.json.return_value = {
-        "items": [{"@id": "http://example.com/measure/123"}]
+    mock_measures_response = _mock_response(
+        {"items": [{"@id": "http://example.com/measure/123"}]}
+    )
+    mock_readings_response = _mock_response(
+        {
+            "items": [
+                {"dateTime": "2024-01-01T00:00:00Z", "value": 5.0},
+                {"dateTime": "2024-01-02T00:00:00Z", "value": 10.0},
+            ]
+        }
+    )
+
+    def mock_get(url, params=None, headers=None, timeout=None):
+        if url.endswith("/measures"):
+            return mock_measures_response
+        return mock_readings_response
+
+    with patch.object(SESSION, "get", side_effect=mock_get):
+        df = fetch_rainfall_data("239374TP", "2024-01-01", "2024-01-02")
+
+        assert len(df) == 2
+        assert "dateTime" in df.columns
+        assert df.schema["value"] == pl.Float64
+
+
+def test_fetch_daily_rainfall_combines_measures_per_window():
+    measures = {
+        "http://example.com/measure/a": 1.0,
+        "http://example.com/measure/b": 0.5,
     }
-    mock_measures_response.raise_for_status = Mock()
+    start = date(2024, 1, 1)
+    end = start + timedelta(days=FETCH_WINDOW_DAYS + 5)
+
+    def mock_get(url, params=None, headers=None, timeout=None):
+        if url.endswith("/measures"):
+            return _mock_response({"items": [{"@id": m} for m in measures]})
+        if "startdate" not in params:
+            return _mock_response({"items": []})
+        # One reading per measure on the first and last day of each window
+        value = measures[url.removesuffix("/readings")]
+        days = {params["startdate"], params["enddate"]}
+        return _mock_response(
+            {
+                "items": [
+                    {"dateTime": f"{day}T00:00:00Z", "value": value} for day in days
+                ]
+            }
+        )
+
+    with patch.object(SESSION, "get", side_effect=mock_get):
+        daily = fetch_daily_rainfall("239374TP", str(start), str(end))
+
+    window_days = [
+        day for window in split_date_range(str(start), str(end)) for day in window
+    ]
+    assert len(window_days) == 4
+    assert daily["date"].to_list() == [date.fromisoformat(day) for day in window_days]
+    assert daily["rainfall_mm"].to_list() == [1.5] * 4
 
-    mock_readings_response = Mock()
-    mock_readings_response.json.return_value = {
+
+def test_split_date_range():
+    windows = split_date_range("2024-01-01", "2024-03-05", window_days=31)
+
+    assert windows[0] == ("2024-01-01", "2024-01-31")
+    assert windows[1] == ("2024-02-01", "2024-03-02")
+    assert windows[-1] == ("2024-03-03", "2024-03-05")
+
+
+def test_get_json_revalidates_cached_body(tmp_path):
+    payload = {"items": [{"@id": "http://example.com/measure/123"}]}
+    session = Mock()
+    session.get.side_effect = [
+        _mock_response(payload, headers={"ETag": '"abc"'}),
+        _mock_response(None, status_code=304),
+    ]
+
+    assert get_json("http://example.com", {}, session, cache_dir=tmp_path) == payload
+    assert get_json("http://example.com", {}, session, cache_dir=tmp_path) == payload
+    assert session.get.call_args.kwargs["headers"] == {"If-None-Match": '"abc"'}
+
+
+def test_get_json_without_cache_dir_stores_nothing(tmp_path, monkeypatch):
+    payload = {"items": []}
+    session = Mock()
+    session.get.return_value = _mock_response(payload, headers={"ETag": '"abc"'})
+    monkeypatch.chdir(tmp_path)
+
+    assert get_json("http://example.com", {}, session, cache_dir=None) == payload
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_available_date_range_is_not_cached(tmp_path, monkeypatch):
+    payload = {
         "items": [
-            {"dateTime": "2024-01-01T00:00:00Z", "value": 5.0},
-            {"dateTime": "2024-01-02T00:00:00Z", "value": 10.0},
+            {"dateTime": "2024-01-02T00:00:00Z", "value": 0.0},
+            {"dateTime": "2024-01-01T00:00:00Z", "value": 0.0},
         ]
     }
-    mock_readings_response.raise_for_status = Mock()
+    session = Mock()
+    session.get.return_value = _mock_response(payload, headers={"ETag": '"abc"'})
+    monkeypatch.chdir(tmp_path)
 
-    with patch("vp_track_status.rainfall.requests.get") as mock_get:
-        mock_get.side_effect = [
-            mock_measures_response,
-            mock_readings_response,
-            mock_readings_response,
-        ]
+    assert get_available_date_range("http://example.com/measure/123", session) == (
+        "2024-01-01",
+        "2024-01-02",
+    )
+    assert list(tmp_path.iterdir()) == []
 
-        df = fetch_rainfall_data("239374TP", "2024-01-01", "2024-01-02")
 
-        assert len(df) == 2
-        assert "dateTime" in df.columns
-        assert "value" in df.columns
+def test_prune_http_cache_evicts_stale_entries(tmp_path):
+    session = Mock()
+    session.get.return_value = _mock_response({}, headers={"ETag": '"abc"'})
+    get_json("http://example.com/old", {}, session, cache_dir=tmp_path)
+    (old_meta,) = tmp_path.glob("*.json")
+    get_json("http://example.com/new", {}, session, cache_dir=tmp_path)
+
+    long_ago = old_meta.stat().st_mtime - 31 * 24 * 60 * 60
+    os.utime(old_meta, (long_ago, long_ago))
+    prune_http_cache(tmp_path, max_age_days=30)
+
+    remaining = sorted(path.suffix for path in tmp_path.iterdir())
+    assert remaining == [".body", ".json"]
+    assert not old_meta.exists()
+
+
+def test_upsert_data_prefers_new_values():
+    existing = pl.DataFrame(
+        {"date": [date(2024, 1, 1), date(2024, 1, 2)], "rainfall_mm": [1.0, 2.0]}
+    )
+    new = pl.DataFrame(
+        {"date": [date(2024, 1, 2), date(2024, 1, 3)], "rainfall_mm": [5.0, 3.0]}
+    )
+
+    result = upsert_data(existing, new)
+
+    assert result["date"].to_list() == [date(2024, 1, i) for i in (1, 2, 3)]
+    assert result["rainfall_mm"].to_list() == [1.0, 5.0, 3.0]
+
+
+def test_save_data_from_matches_full_rewrite(tmp_path):
+    existing = pl.DataFrame(
+        {"date": [date(2024, 1, i) for i in (1, 2, 3)], "rainfall_mm": [1.0, 2.0, 0.5]}
+    )
+    new = pl.DataFrame(
+        {"date": [date(2024, 1, 2), date(2024, 1, 4)], "rainfall_mm": [2.5, 3.5]}
+    )
+    combined = upsert_data(existing, new)
+
+    partial_file = tmp_path / "partial.csv"
+    save_data(existing, partial_file)
+    save_data_from(combined, date(2024, 1, 2), partial_file)
+    rewritten_file = tmp_path / "rewritten.csv"
+    save_data(combined, rewritten_file)
+
+    assert partial_file.read_text() == rewritten_file.read_text()
+    assert pl.read_parquet(partial_file.with_suffix(".parquet")).equals(
+        add_rolling_features(combined)
+    )
+
+
+def test_save_data_from_rewrites_csv_without_final_newline(tmp_path):
+    rainfall_file = tmp_path / "rainfall.csv"
+    rainfall_file.write_text("date,rainfall_mm\n2024-01-01,1.0\n2024-01-02,2.5")
+    combined = upsert_data(
+        load_existing_data(rainfall_file),
+        pl.DataFrame({"date": [date(2024, 1, 5)], "rainfall_mm": [3.0]}),
+    )
+
+    save_data_from(combined, date(2024, 1, 5), rainfall_file)
+
+    assert pl.read_csv(rainfall_file, schema=RAINFALL_SCHEMA).equals(combined)
+
+
+def test_save_data_from_rewrites_unsorted_csv(tmp_path):
+    rainfall_file = tmp_path / "rainfall.csv"
+    rainfall_file.write_text(
+        "date,rainfall_mm\n2024-01-01,1.0\n2024-01-06,6.0\n2024-01-03,3.0\n"
+    )
+    combined = upsert_data(
+        load_existing_data(rainfall_file),
+        pl.DataFrame({"date": [date(2024, 1, 5)], "rainfall_mm": [5.0]}),
+    )
+
+    save_data_from(combined, date(2024, 1, 5), rainfall_file)
+
+    assert pl.read_csv(rainfall_file, schema=RAINFALL_SCHEMA).equals(combined)
+    assert len(combined) == 4
+
+
+def test_load_existing_data_ignores_stale_parquet_cache(tmp_path):
+    rainfall_file = tmp_path / "rainfall.csv"
+    save_data(
+        pl.DataFrame({"date": [date(2024, 1, 1)], "rainfall_mm": [2.0]}),
+        rainfall_file,
+    )
+    # Correct the CSV by hand, leaving a newer but stale Parquet cache behind
+    rainfall_file.write_text("date,rainfall_mm\n2024-01-01,9.0\n")
+    rainfall_file.with_suffix(".parquet").touch()
+
+    assert load_existing_data(rainfall_file)["rainfall_mm"].to_list() == [9.0]
+
+
+def test_readings_tolerate_string_values():
+    session = Mock()
+    session.get.return_value = _mock_response(
+        {
+            "items": [
+                {"dateTime": "2024-01-01T00:00:00Z", "value": 0.2},
+                {"dateTime": "2024-01-01T00:15:00Z", "value": "0.4"},
+                {"dateTime": "2024-01-01T00:30:00Z", "value": "n/a"},
+            ]
+        }
+    )
+
+    df = fetch_readings_for_measure(
+        "http://example.com/measure/123", "2024-01-01", "2024-01-01", session
+    )
+    daily = aggregate_daily(df)
+
+    assert df["value"].to_list() == [0.2, 0.4, None]
+    assert daily["date"].to_list() == [date(2024, 1, 1)]
+    assert daily["rainfall_mm"].to_list() == pytest.approx([0.6])
@@ -1,8 +1,13 @@
 """Tests for website generation."""
 
+import os
+import shutil
 from datetime import date
+from pathlib import Path
 
-from vp_track_status.website import generate_html
+from vp_track_status import website
+from vp_track_status.constants import MODEL_FILE
+from vp_track_status.website import generate_html, generate_site
 
 
 def test_generate_html(sample_rainfall_data):
@@ -24,3 +29,32 @@ def test_generate_html(sample_rainfall_data):
     assert isinstance(html, str)
     assert len(html) > 0
     assert "<!DOCTYPE html>" in html
+
+
+def test_generate_site_skips_up_to_date_page(
+    sample_rainfall_data, tmp_path, monkeypatch
+):
+    rainfall_file = tmp_path / "rainfall.csv"
+    model_file = tmp_path / "model.onnx"
+    sample_rainfall_data.write_csv(rainfall_file)
+    # The committed model keeps this module free of the train group
+    shutil.copy(Path(__file__).parents[1] / MODEL_FILE, model_file)
+    monkeypatch.setattr(website, "RAINFALL_FILE", rainfall_file)
+    monkeypatch.setattr(website, "MODEL_FILE", model_file)
+    output_dir = tmp_path / "site"
+
+    output_file, rendered = generate_site(output_dir=output_dir)
+    assert rendered
+    assert "<!DOCTYPE html>" in output_file.read_text()
+
+    _, rendered = generate_site(output_dir=output_dir)
+    assert not rendered
+
+    _, rendered = generate_site(output_dir=output_dir, force=True)
+    assert rendered
+
+    # New rainfall makes the page stale again
+    stale = output_file.stat().st_mtime_ns + 1_000_000_000
+    os.utime(rainfall_file, ns=(stale, stale))
+    _, rendered = generate_site(output_dir=output_dir)
+    assert rendered